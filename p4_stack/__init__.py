@@ -0,0 +1,2 @@
+# Must match the version in pyproject.toml, tests/test_p4_actions.py checks it
+__version__ = "0.1.1"
@@ -21,6 +21,8 @@ from ..core.types import (
 log = logging.getLogger(__name__)
 console = Console(stderr=True)
 
+CHANGE_CREATED_RE = re.compile(r"Change (\d+) created.")
+
 
 def create_stack(parent_cl: int) -> None:
     """
@@ -34,7 +36,7 @@ def create_stack(parent_cl: int) -> None:
                 p4.run("describe", "-s", parent_cl)
             except P4OperationError as e:
                 console.print(f"Error: Parent CL '{parent_cl}' not found or is invalid.")
-                log.error(f"Failed to fetch parent CL {parent_cl}: {e}")
+                log.error("Failed to fetch parent CL %d: %s", parent_cl, e)
                 raise typer.Exit(code=1)
             
             # 2. Create CL: Run p4 change -o to get a new changelist spec
@@ -42,7 +44,7 @@ def create_stack(parent_cl: int) -> None:
                 change_spec = cast(list[RunChangeO], p4.run("change", "-o"))
             except P4OperationError as e:
                 console.print(f"Error: Fail to get new CL spec.")
-                log.error(f"Failed to get new CL spec: {e}")
+                log.error("Failed to get new CL spec: %s", e)
                 raise typer.Exit(code=1)
             
             # 3. Set Parent: Set the Description field
@@ -55,7 +57,7 @@ def create_stack(parent_cl: int) -> None:
             result_str = p4.save_change(change_spec[0])[0]
 
             # 5. Output: Confirm the new CL
-            match = re.search(r"Change (\d+) created.", result_str)
+            match = CHANGE_CREATED_RE.search(result_str)
             if not match:
                 raise P4OperationError(f"Could not parse new CL number from: {result_str}")
             
@@ -5,14 +5,13 @@ import typer
 import logging
 from rich.console import Console
 from rich.tree import Tree
-from P4 import P4 # type: ignore
 
 from ..core.p4_actions import (
     P4Connection,
     P4Exception,
     P4LoginRequiredError
 )
-from ..core.graph import AdjacencyList, build_stack_graph, get_changelist_status
+from ..core.graph import AdjacencyList, build_stack_graph, get_changelist_statuses
 
 log = logging.getLogger(__name__)
 console = Console(stderr=True)
@@ -22,17 +21,16 @@ def _build_rich_tree(
     node: int,
     graph: AdjacencyList, 
     parent_tree: Tree,
-    p4: P4
+    statuses: dict[int, str]
 ) -> None:
     """Recursively builds a rich.Tree for a given stack."""
 
-    status = get_changelist_status(p4, node)
-    node_label = f"► [bold]{node}[/bold] {status}"
+    node_label = f"► [bold]{node}[/bold] {statuses[node]}"
     child_tree = parent_tree.add(node_label)
 
     children = sorted(graph.get(node, []))
     for child in children:
-        _build_rich_tree(child, graph, child_tree, p4)
+        _build_rich_tree(child, graph, child_tree, statuses)
 
 def list_stack() -> None:
     """
@@ -43,8 +41,8 @@ def list_stack() -> None:
             console.print(f"Fetching pending changes for @{p4.user}...")
 
             graph, child_to_parent = build_stack_graph(p4.p4)
-            log.debug(f"graph: {graph}")
-            log.debug(f"children_to_parent: {child_to_parent}")
+            log.debug("graph: %s", graph)
+            log.debug("children_to_parent: %s", child_to_parent)
             if not graph and not child_to_parent:
                 console.print("No stacked changes found.")
                 return
@@ -53,9 +51,9 @@ def list_stack() -> None:
             all_parents = set(graph.keys())
             all_children = set(child_to_parent.keys())
             root_nodes = sorted(list(all_parents - all_children))
-            log.debug(f"all_parents: {all_parents}")
-            log.debug(f"all_childrens: {all_children}")
-            log.debug(f"root_nodes: {root_nodes}")
+            log.debug("all_parents: %s", all_parents)
+            log.debug("all_childrens: %s", all_children)
+            log.debug("root_nodes: %s", root_nodes)
 
             if not root_nodes:
                 potential_roots: set[int] = set()
@@ -65,7 +63,7 @@ def list_stack() -> None:
 
                 if not potential_roots:
                     console.print("No stack roots found.")
-                    log.warning(f"Graph has nodes but no roots. Graph: {graph}, ChildMap: {child_to_parent}")
+                    log.warning("Graph has nodes but no roots. Graph: %s, ChildMap: %s", graph, child_to_parent)
                     return
                 root_nodes = sorted(list(potential_roots))
 
@@ -73,8 +71,11 @@ def list_stack() -> None:
                 f"Current Stacks for {p4.user}:",
             )
 
+            # One batched describe instead of a round trip per node
+            statuses = get_changelist_statuses(p4.p4, sorted(all_parents | all_children))
+
             for root in root_nodes:
-                _build_rich_tree(root, graph, rich_tree, p4.p4)
+                _build_rich_tree(root, graph, rich_tree, statuses)
 
             console.print(rich_tree)
             
@@ -27,7 +27,7 @@ from ..core.graph import (
 )
 
 from ..core.rebase import (
-    get_cl_snapshot,
+    get_cl_snapshot_cached,
     edit_snapshot_with_editor,
     three_way_merge_folder,
     commit_snapshot_to_cl,
@@ -49,7 +49,7 @@ def update_stack(base_cl: int) -> None:
 
             # Get the full stack to process in parent-first order (BFS)
             stack_to_process = get_stack_from_base(base_cl, graph)
-            log.debug(f"stack_to_process: {stack_to_process}")
+            log.debug("stack_to_process: %s", stack_to_process)
 
             # --- Phase 1: Load Phase ---
             original_stack: StackSnapshot = {}
@@ -57,23 +57,23 @@ def update_stack(base_cl: int) -> None:
             filename_to_depot_map: dict[int, FileToDepot] = {}
             try:
                 for cl_num in stack_to_process:
-                    snapshot, filename_to_depot = get_cl_snapshot(p4.p4, cl_num)
-                    log.debug(filename_to_depot)
+                    snapshot, filename_to_depot = get_cl_snapshot_cached(p4.p4, cl_num)
+                    log.debug("filename_to_depot: %s", filename_to_depot)
                     original_stack[cl_num] = snapshot
                     filename_to_depot_map[cl_num] = filename_to_depot
             except Exception as e:
-                log.error(f"Failed to load snapshots. Aborting. {e}")
+                log.error("Failed to load snapshots. Aborting. %s", e)
                 console.print(f"Error: Failed to load snapshots: {e}")
                 return
-            log.debug(f"original_stack: {original_stack}")
+            log.debug("original_stack: %s", original_stack)
             
             # --- Phase 2: Edit Phase ---
             try:
                 new_base_folder = edit_snapshot_with_editor(original_stack[base_cl])
-                log.debug(f"base_cl: {original_stack[base_cl]}")
-                log.debug(f"new_base_folder: {new_base_folder}")
+                log.debug("base_cl: %s", original_stack[base_cl])
+                log.debug("new_base_folder: %s", new_base_folder)
             except Exception as e:
-                log.error(f"Failed during edit phase. Aborting. {e}")
+                log.error("Failed during edit phase. Aborting. %s", e)
                 console.print(f"Error: Editor failed: {e}")
                 return
             
@@ -85,20 +85,20 @@ def update_stack(base_cl: int) -> None:
             for cl_num in stack_to_process[1:]:
                 parent_cl = child_to_parent.get(cl_num)
                 if parent_cl is None: # Should be impossible if stack is correct
-                    log.error(f"Logic error: CL {cl_num} in stack but has no parent. Aborting.")
+                    log.error("Logic error: CL %d in stack but has no parent. Aborting.", cl_num)
                     raise P4OperationError(f"Logic error: CL {cl_num} has no parent.")
                 
                 base_folder = original_stack[parent_cl] # Original parent
                 ours_folder = original_stack[cl_num]    # Oringal child
                 theirs_folder = new_stack[parent_cl]    # New parent
 
-                log.debug(f"base_folder: {base_folder}")
-                log.debug(f"ours_folder: {ours_folder}")
-                log.debug(f"theirs_folder: {theirs_folder}")
+                log.debug("base_folder: %s", base_folder)
+                log.debug("ours_folder: %s", ours_folder)
+                log.debug("theirs_folder: %s", theirs_folder)
 
                 # Run merge, returns: {file: (content, has_conflict)}
                 merged_result = three_way_merge_folder(base_folder, ours_folder, theirs_folder)
-                log.debug(f"Merged result for {cl_num}: {merged_result}")
+                log.debug("Merged result for %d: %s", cl_num, merged_result)
 
                 # Process results
                 merged_snapshot: Snapshot = {}
@@ -123,7 +123,7 @@ def update_stack(base_cl: int) -> None:
                     try:
                         resolved_files = edit_snapshot_with_editor(conflicted_files)
                     except Exception as e:
-                        log.error(f"Editor failed. Aborting update. {e}")
+                        log.error("Editor failed. Aborting update. %s", e)
                         raise typer.Exit(code=1)
                     
                     # Re-validate user's edits, good enough regex detection
@@ -142,9 +142,9 @@ def update_stack(base_cl: int) -> None:
             console.print("In-memory rebase successful. Committing changes to Perforce...")
             try:
                 for cl_num in stack_to_process:
-                    log.debug(f"cl_num: {cl_num}")
-                    log.debug(f"new_stack[cl_num]: {new_stack[cl_num]}")
-                    log.debug(f"original_stack[cl_num]: {original_stack[cl_num]}")
+                    log.debug("cl_num: %d", cl_num)
+                    log.debug("new_stack[cl_num]: %s", new_stack[cl_num])
+                    log.debug("original_stack[cl_num]: %s", original_stack[cl_num])
 
                     commit_snapshot_to_cl(
                         p4.p4, 
@@ -155,7 +155,7 @@ def update_stack(base_cl: int) -> None:
                     )
                 console.print(f"Stack update complete for CL {base_cl}")
             except Exception as e:
-                log.error(f"An error occurred during commit: {e}")
+                log.error("An error occurred during commit: %s", e)
 
     # --- Global Error Handling ---
     except P4LoginRequiredError as e:
@@ -163,9 +163,9 @@ def update_stack(base_cl: int) -> None:
         raise typer.Exit(code=0)
     except P4Exception as e:
         console.print(f"\nPerforce Error: {e}")
-        log.exception(f"P4 Error in update_stack for CL {base_cl}")
+        log.exception("P4 Error in update_stack for CL %d", base_cl)
         raise typer.Exit(code=1)
     except Exception as e:
         console.print(f"\nAn unexpected error occurred: {e}")
-        log.exception(f"Unexpected error in update_stack for CL {base_cl}")
+        log.exception("Unexpected error in update_stack for CL %d", base_cl)
         raise typer.Exit(code=1)
\ No newline at end of file
@@ -4,9 +4,9 @@ CL dependency graph.
 """
 import re
 import logging
-from collections import defaultdict
+from collections import defaultdict, deque
 from P4 import P4 # type: ignore
-from typing import cast
+from typing import Iterable, cast
 
 from .types import (
     AdjacencyList,
@@ -21,6 +21,15 @@ log = logging.getLogger(__name__)
 DEPENDS_ON_RE = re.compile(r"Depends-On:\s*(\d+)")
 
 
+def parse_depends_on(desc: str) -> int | None:
+    """
+    Extracts the parent CL number from a description's Depends-On tag.
+    Returns None if the description has no numbered tag.
+    """
+    match = DEPENDS_ON_RE.search(desc)
+    return int(match.group(1)) if match else None
+
+
 def build_stack_graph(p4: P4) -> tuple[AdjacencyList, ReverseLookup]:
     """
     Builds the full dependency graph for the current user's pending CLs.
@@ -32,7 +41,7 @@ def build_stack_graph(p4: P4) -> tuple[AdjacencyList, ReverseLookup]:
             list[RunChangesS], p4.run_changes("-s", "pending", "-l", "--me")  # type: ignore
         )
     except Exception as e:
-        log.error(f"Failed to run p4 changes: {e}")
+        log.error("Failed to run p4 changes: %s", e)
         raise P4OperationError(f"Failed to fetch pending changelists: {e}")
     
     graph: AdjacencyList = defaultdict(list)
@@ -40,11 +49,9 @@ def build_stack_graph(p4: P4) -> tuple[AdjacencyList, ReverseLookup]:
 
     for cl in pending_cls:
         cl_num = int(cl['change'])
-        desc = cl['desc']
 
-        match = DEPENDS_ON_RE.search(desc)
-        if match:
-            parent_num = int(match.group(1))
+        parent_num = parse_depends_on(cl['desc'])
+        if parent_num is not None:
             graph[parent_num].append(cl_num)
             child_to_parent[cl_num] = parent_num
 
@@ -59,21 +66,26 @@ def get_stack_from_base(
     starting from a given base CL.
     """
     stack_to_process: list[int] = []
-    queue = [base_cl]
+    queue: deque[int] = deque([base_cl])
     visited = {base_cl}
 
+    # Bind hot-loop methods to locals to skip repeated attribute lookups
+    popleft, enqueue = queue.popleft, queue.append
+    visit, emit = visited.add, stack_to_process.append
+    get_children = graph.get
+
     # Get the full stack to process in parent-first order (BFS)
     while queue:
-        current_cl = queue.pop(0)
-        stack_to_process.append(current_cl)
+        current_cl = popleft()
+        emit(current_cl)
 
-        for child in graph.get(current_cl, []):
+        for child in get_children(current_cl, ()):
             if child not in visited:
-                visited.add(child)
-                queue.append(child)
+                visit(child)
+                enqueue(child)
      
     if not stack_to_process:
-        log.error(f"CL {base_cl} not found in pending stack graph.")
+        log.error("CL %d not found in pending stack graph.", base_cl)
         return [base_cl]
 
     return stack_to_process
@@ -98,23 +110,44 @@ def get_stack_for_cl(
     stack.reverse()
     return stack
 
-def get_changelist_status(p4: P4, node: int) -> str:
+def _format_status(change_info: RunDescribeS) -> str:
+    """Maps a p4 describe record to its display label."""
+    status = change_info.get('status', '').lower()
+    if status == 'pending':
+        return "(pending)"
+    elif status == 'submitted':
+        return "(submitted)"
+    return "(not found)"
+
+def get_changelist_statuses(p4: P4, nodes: Iterable[int]) -> dict[int, str]:
     """
-    Determines the status of a changelist by running p4 describe.
-    Returns one of: "(submitted)", "(pending)", or "(not found)"
+    Determines the status of every node with a single p4 describe.
+    Returns {cl_num: status}, each one of "(submitted)", "(pending)", or
+    "(not found)" for CLs the server doesn't know.
     """
+    statuses = {node: "(not found)" for node in nodes}
+    if not statuses:
+        return statuses
+
+    # Unknown CLs must not abort the whole batch, so never raise here
+    saved_level = p4.exception_level # type: ignore
+    p4.exception_level = 0
     try:
-        result = cast(list[RunDescribeS], p4.run("describe", "-s", str(node))) # type: ignore
-        logging.debug(f"result: {result}")
-        if result and len(result) > 0:
-            change_info = result[0]
-            status = change_info.get('status', '').lower()
-            if status == 'pending':
-                return "(pending)"
-            elif status == 'submitted':
-                return "(submitted)"
+        result = cast(
+            list[RunDescribeS], p4.run("describe", "-s", *map(str, statuses)) # type: ignore
+        )
     except Exception as e:
-        log.warning(f"Error getting status for changelist {node}: {e}")
-        pass
-    
-    return "(not found)"
\ No newline at end of file
+        log.warning("Error getting status for changelists %s: %s", list(statuses), e)
+        return statuses
+    finally:
+        p4.exception_level = saved_level
+
+    for change_info in result:
+        # Submitting can renumber a CL: describe then reports the new number
+        # in 'change' and the one we asked about in 'oldChange'
+        for key in ('change', 'oldChange'):
+            cl_num = int(change_info.get(key, -1))
+            if cl_num in statuses:
+                statuses[cl_num] = _format_status(change_info)
+
+    return statuses
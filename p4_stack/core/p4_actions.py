@@ -3,13 +3,16 @@ Contains the P4Connection context manager and custom exceptions
 for robust Perforce API interaction.
 """
 from P4 import P4, P4Exception as P4LibException # type: ignore
-from typing import Any, cast
+from typing import Any, Callable, Concatenate, ParamSpec, TypeVar, cast
+import functools
 import os
+import re
 import logging
 
 log = logging.getLogger(__name__)
 
 from .types import RunChangeO
+from .. import __version__
 
 # --- Custom Domain-Specific Exceptions ---
 
@@ -41,10 +44,46 @@ class P4ConflictException(P4OperationError):
 
 # --- Helper for Error Parsing ---
 
+_LOGIN_ERROR_RE = re.compile(r"session has expired|please login", re.IGNORECASE)
+
 def _is_login_error(err_str: str) -> bool:
     """Checks if a P4Exception string indicates a login is required."""
-    err_lower = err_str.lower()
-    return "session has expired" in err_lower or "please login" in err_lower
+    return _LOGIN_ERROR_RE.search(err_str) is not None
+
+_P = ParamSpec("_P")
+_R = TypeVar("_R")
+_Method = Callable[Concatenate["P4Connection", _P], _R]
+
+def _translate_p4_errors(failure_msg: str) -> Callable[[_Method[_P, _R]], _Method[_P, _R]]:
+    """
+    Decorates a P4Connection method: checks the connection is live, then maps
+    any P4Python exception onto the p4-stack exception hierarchy.
+    """
+    def decorator(method: _Method[_P, _R]) -> _Method[_P, _R]:
+        @functools.wraps(method)
+        def wrapper(self: "P4Connection", *args: _P.args, **kwargs: _P.kwargs) -> _R:
+            if not self.p4.connected(): # type: ignore
+                raise P4ConnectionError("P4 is not connected.")
+
+            try:
+                return method(self, *args, **kwargs)
+            except P4LibException as e:
+                err_str = str(e)
+                if _is_login_error(err_str):
+                    raise P4LoginRequiredError("Perforce session expired. Please run 'p4 login'.")
+
+                # Log the full error from Perforce
+                for error in self.p4.errors: # type: ignore
+                    log.error("P4 Error: %s", error)
+
+                raise P4OperationError(f"{failure_msg}: {err_str}")
+            except P4Exception:
+                raise
+            except Exception as e:
+                log.exception("Unexpected error during %s(%s): %s", method.__name__, args, e)
+                raise P4Exception(f"Unexpected error: {e}")
+        return wrapper
+    return decorator
 
 # --- P4Connection Class ---
 
@@ -56,6 +95,9 @@ class P4Connection:
     
     def __init__(self) -> None:
         self.p4: P4 = P4()
+        # Identify ourselves in the server log, must be set before connect()
+        self.p4.prog = "p4-stack"
+        self.p4.version = __version__
         self.user: str | None = None
 
     def __enter__(self) -> 'P4Connection':
@@ -80,40 +122,15 @@ class P4Connection:
         if self.p4.connected():  # type: ignore
             self.p4.disconnect() # type: ignore
     
+    @_translate_p4_errors("P4 command failed")
     def run(self, *args: Any) -> list[dict[str, Any]]:
         """
         Runs a P4 command and returns the tagged result, handling errors.
         """
-        if not self.p4.connected(): # type: ignore
-            raise P4ConnectionError("P4 is not connected.")
-        
-        try:
-            result = cast(list[dict[str, Any]], self.p4.run(*args)) # type: ignore
-            return result  # The result itself is already the tagged output
-        except P4LibException as e:
-            err_str = str(e)
-            if _is_login_error(err_str):
-                raise P4LoginRequiredError("Perforce session expired. Please run 'p4 login'.")
-            
-            # Log the full error from Perforce
-            for error in self.p4.errors: # type: ignore
-                log.error(f"P4 Error: {error}")
-            
-            raise P4OperationError(f"P4 command failed: {err_str}")
-        except Exception as e:
-            log.exception(f"Unexpected error during p4.run({args}): {e}")
-            raise P4Exception(f"Unexpected error: {e}")
+        # The result itself is already the tagged output
+        return cast(list[dict[str, Any]], self.p4.run(*args)) # type: ignore
     
+    @_translate_p4_errors("Failed to save changelist")
     def save_change(self, spec: RunChangeO) -> list[str]:
         """Convenience wrapper for 'p4.save_change'"""
-        if not self.p4.connected(): # type: ignore
-            raise P4ConnectionError("P4 is not connected.")
-        
-        try:
-            result = cast(list[str], self.p4.save_change(spec)) # type: ignore
-            return result
-        except P4LibException as e:
-            err_str = str(e)
-            if _is_login_error(err_str):
-                raise P4LoginRequiredError("Perforce session expired. Please run 'p4 login'.")
-            raise P4OperationError(f"Failed to save changelist: {e}")
\ No newline at end of file
+        return cast(list[str], self.p4.save_change(spec)) # type: ignore
@@ -5,6 +5,12 @@ import logging
 import tempfile
 import os
 import subprocess
+import json
+import re
+import time
+import hashlib
+from pathlib import Path
+from difflib import SequenceMatcher
 from P4 import P4 # type: ignore
 from typing import cast, Any
 
@@ -14,11 +20,31 @@ from .types import (
     MergeResult,
     RunPrintMetaData,
     RunWhere,
+    RunDescribeS,
 )
 from .p4_actions import P4OperationError
 
 log = logging.getLogger(__name__)
 
+# Conflict markers, in the same layout diff3 -m uses
+CONFLICT_START = "<<<<<<< ours\n"
+CONFLICT_SEP = "=======\n"
+CONFLICT_END = ">>>>>>> theirs\n"
+
+# P4 messages meaning the CL simply has nothing shelved
+_EMPTY_SHELF_RE = re.compile(r"no such file\(s\)|empty changelist")
+
+# Diffs longer than this let SequenceMatcher junk very frequent lines
+_AUTOJUNK_MIN_LINES = 2000
+
+# Max file arguments per p4 edit/delete, keeps each request a bounded size
+_P4_ARGS_BATCH = 512
+
+SNAPSHOT_CACHE_DIR = Path.home() / ".cache" / "p4-stack" / "shelves"
+
+# Cache entries not read or written for this long are pruned on the next write
+_SNAPSHOT_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
 
 def get_cl_snapshot(p4: P4, cl_num: int) -> tuple[Snapshot, FileToDepot]:
     """
@@ -34,20 +60,115 @@ def get_cl_snapshot(p4: P4, cl_num: int) -> tuple[Snapshot, FileToDepot]:
             content = cast(str, shelved_files[i+1])
 
             depot_file: str = metadata["depotFile"].strip("'\"")
-            filename: str = os.path.basename(depot_file)
+            filename: str = depot_file.rpartition("/")[2]
 
             snapshot[filename] = content
             filename_to_depot[filename] = depot_file
 
     except Exception as e:
-        log.error(f"Error getting snapshot for CL {cl_num}: {e}")
+        log.error("Error getting snapshot for CL %d: %s", cl_num, e)
         # Check if it's a "no shelved files" error, which is non-fatal
-        if "no such file(s)" in str(e) or "empty changelist" in str(e):
+        if _EMPTY_SHELF_RE.search(str(e)):
              return snapshot, filename_to_depot # Return empty
         raise P4OperationError(f"Failed to p4 print @={cl_num}: {e}")
 
     return snapshot, filename_to_depot
 
+def _shelf_cache_key(described: RunDescribeS) -> str | None:
+    """
+    Hashes the (depotFile, rev, digest) records of a CL's shelved files, so any
+    re-shelve that changes content changes the key, whatever the CL's time says.
+    Returns None if the shelf is empty or the server reported no digests.
+    """
+    depot_files = described.get("depotFile", [])
+    revs = described.get("rev", [])
+    digests = described.get("digest", [])
+    if not depot_files or not len(depot_files) == len(revs) == len(digests):
+        return None
+
+    key = hashlib.blake2b(digest_size=16)
+    for record in sorted(zip(depot_files, revs, digests)):
+        key.update("\0".join(record).encode("utf-8") + b"\n")
+    return key.hexdigest()
+
+def _evict_cached_snapshots(cl_num: int) -> None:
+    """Removes every cache entry for cl_num."""
+    try:
+        for stale in SNAPSHOT_CACHE_DIR.glob(f"{cl_num}_*.json"):
+            stale.unlink(missing_ok=True)
+    except OSError as e:
+        log.warning("Failed to evict snapshot cache for CL %d: %s", cl_num, e)
+
+def _prune_snapshot_cache() -> None:
+    """Removes entries unused for _SNAPSHOT_CACHE_MAX_AGE, e.g. long-submitted CLs."""
+    cutoff = time.time() - _SNAPSHOT_CACHE_MAX_AGE
+    try:
+        for entry in SNAPSHOT_CACHE_DIR.glob("*.json"):
+            if entry.stat().st_mtime < cutoff:
+                entry.unlink(missing_ok=True)
+    except OSError as e:
+        log.warning("Failed to prune snapshot cache: %s", e)
+
+def get_cl_snapshot_cached(p4: P4, cl_num: int) -> tuple[Snapshot, FileToDepot]:
+    """
+    Same as get_cl_snapshot, but backed by an on-disk cache keyed by
+    (cl_num, hash of the shelved files' digests).
+    Submitted or missing CLs bypass the cache and have their entries evicted.
+    """
+    try:
+        described = cast(list[RunDescribeS], p4.run_describe("-s", "-S", cl_num))[0] # type: ignore
+    except Exception as e:
+        log.warning("Could not describe CL %d, bypassing snapshot cache: %s", cl_num, e)
+        _evict_cached_snapshots(cl_num)
+        return get_cl_snapshot(p4, cl_num)
+
+    cache_key = None if described.get("status") == "submitted" else _shelf_cache_key(described)
+    if cache_key is None:
+        log.debug("CL %d has no cacheable shelf, bypassing snapshot cache", cl_num)
+        _evict_cached_snapshots(cl_num)
+        return get_cl_snapshot(p4, cl_num)
+
+    cache_file = SNAPSHOT_CACHE_DIR / f"{cl_num}_{cache_key}.json"
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        snapshot, filename_to_depot = cached["snapshot"], cached["filename_to_depot"]
+        if not isinstance(snapshot, dict) or not isinstance(filename_to_depot, dict):
+            raise ValueError("unexpected cache layout")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("Ignoring unreadable snapshot cache %s: %s", cache_file, e)
+    else:
+        log.debug("Snapshot cache hit for CL %d", cl_num)
+        # Mark as recently used so pruning keeps it, a failure here is harmless
+        try:
+            os.utime(cache_file)
+        except OSError as e:
+            log.debug("Could not touch snapshot cache %s: %s", cache_file, e)
+        return cast(Snapshot, snapshot), cast(FileToDepot, filename_to_depot)
+
+    result = get_cl_snapshot(p4, cl_num)
+
+    # Drop stale entries for this CL, and any long unused ones, before writing
+    _evict_cached_snapshots(cl_num)
+    _prune_snapshot_cache()
+    try:
+        # Shelved content can be private, keep it readable by this user only
+        SNAPSHOT_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Write-then-rename so a concurrent reader never sees a partial file
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"snapshot": result[0], "filename_to_depot": result[1]}, f)
+            os.replace(tmp_file, cache_file)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+    except OSError as e:
+        log.warning("Failed to write snapshot cache for CL %d: %s", cl_num, e)
+
+    return result
+
 def edit_snapshot_with_editor(snapshot: Snapshot) -> Snapshot:
     """
     Writes a snapshot to a temp dir, launches $EDITOR, and reads it back.
@@ -70,7 +191,7 @@ def edit_snapshot_with_editor(snapshot: Snapshot) -> Snapshot:
         try:
             subprocess.run([editor] + local_paths, check=True)
         except Exception as e:
-            log.error(f"Error running editor '{editor}'. Aborting. {e}")
+            log.error("Error running editor '%s'. Aborting. %s", editor, e)
             raise P4OperationError(f"Editor '{editor}' failed. Aborting update.")
 
         # Read thew new snapshot
@@ -82,47 +203,146 @@ def edit_snapshot_with_editor(snapshot: Snapshot) -> Snapshot:
         
         return new_snapshot
     
+def _matching_blocks(a: list[str], b: list[str]) -> list[tuple[int, int, int]]:
+    """
+    SequenceMatcher(a, b).get_matching_blocks(), with the pair's common prefix
+    and suffix matched up front. When the rest is still over
+    _AUTOJUNK_MIN_LINES, lets difflib skip very frequent lines ("}", blank
+    lines) as match seeds: without that its cost grows with the square of
+    how often they repeat, seconds on a 10k-line file.
+    """
+    n, m = len(a), len(b)
+    shortest = min(n, m)
+    prefix = 0
+    while prefix < shortest and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < shortest - prefix and a[n - 1 - suffix] == b[m - 1 - suffix]:
+        suffix += 1
+
+    a_mid, b_mid = a[prefix:n - suffix], b[prefix:m - suffix]
+    autojunk = max(len(a_mid), len(b_mid)) > _AUTOJUNK_MIN_LINES
+    found = SequenceMatcher(None, a_mid, b_mid, autojunk=autojunk).get_matching_blocks()
+
+    raw = [(0, 0, prefix)] if prefix else []
+    raw.extend((prefix + i, prefix + j, size) for i, j, size in found if size)
+    if suffix:
+        raw.append((n - suffix, m - suffix, suffix))
+
+    # Join blocks that now touch, e.g. the prefix and a match right after it
+    blocks: list[tuple[int, int, int]] = []
+    for i, j, size in raw:
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1] = (blocks[-1][0], blocks[-1][1], blocks[-1][2] + size)
+        else:
+            blocks.append((i, j, size))
+    blocks.append((n, m, 0))
+    return blocks
+
+def _sync_regions(
+    base: list[str],
+    ours: list[str],
+    theirs: list[str]
+) -> list[tuple[int, int, int, int, int, int]]:
+    """
+    Finds the regions where base, ours and theirs all agree.
+    Returns (base_start, base_end, ours_start, ours_end, theirs_start, theirs_end)
+    tuples, ending with an empty sentinel region at the end of every file.
+    """
+    ours_matches = _matching_blocks(base, ours)
+    theirs_matches = _matching_blocks(base, theirs)
+
+    regions: list[tuple[int, int, int, int, int, int]] = []
+    io = it = 0
+    while io < len(ours_matches) and it < len(theirs_matches):
+        o_base, o_start, o_len = ours_matches[io]
+        t_base, t_start, t_len = theirs_matches[it]
+
+        # Overlap of the two base ranges is stable on all three sides
+        start = max(o_base, t_base)
+        end = min(o_base + o_len, t_base + t_len)
+        if start < end:
+            regions.append((
+                start, end,
+                o_start + (start - o_base), o_start + (end - o_base),
+                t_start + (start - t_base), t_start + (end - t_base),
+            ))
+
+        if o_base + o_len < t_base + t_len:
+            io += 1
+        else:
+            it += 1
+
+    regions.append((len(base), len(base), len(ours), len(ours), len(theirs), len(theirs)))
+    return regions
+
+def _ensure_newline(lines: list[str]) -> list[str]:
+    """Terminates the last line so a following conflict marker starts a new line."""
+    if lines and not lines[-1].endswith("\n"):
+        return lines[:-1] + [lines[-1] + "\n"]
+    return lines
+
 def _three_way_merge_file(
     base: str | None,
     ours: str | None,
     theirs: str | None
 ) -> MergeResult:
     """
-    Performs a 3-way merge on string content.
-    Handles None inputs (adds/deletes) by writing empty temp files.)
+    Performs a line-based 3-way merge on string content, in-process.
+    Follows diff3 -m: a hunk changed on one side takes that side, a hunk
+    changed identically on both sides is taken once, anything else is
+    emitted between conflict markers. None inputs (adds/deletes) are empty.
     """
-    # Use delete=False to manage paths, clean up in finally
-    base_f = tempfile.NamedTemporaryFile(mode='w', delete=False, encoding="utf-8")
-    ours_f = tempfile.NamedTemporaryFile(mode='w', delete=False, encoding="utf-8")
-    theirs_f = tempfile.NamedTemporaryFile(mode='w', delete=False, encoding="utf-8")
-
-    try:
-        base_f.write(base or "")
-        ours_f.write(ours or "")
-        theirs_f.write(theirs or "")
-
-        base_f.close()
-        ours_f.close()
-        theirs_f.close()
-
-        base_path, ours_path, theirs_path = base_f.name, ours_f.name, theirs_f.name
+    base_lines = (base or "").splitlines(keepends=True)
+    ours_lines = (ours or "").splitlines(keepends=True)
+    theirs_lines = (theirs or "").splitlines(keepends=True)
+
+    # Lines shared by all three at either end are stable, keep them out of
+    # SequenceMatcher, whose cost grows much faster than the file length
+    shortest = min(len(base_lines), len(ours_lines), len(theirs_lines))
+    prefix = 0
+    while (prefix < shortest
+           and base_lines[prefix] == ours_lines[prefix] == theirs_lines[prefix]):
+        prefix += 1
+    suffix = 0
+    while (suffix < shortest - prefix
+           and base_lines[-1 - suffix] == ours_lines[-1 - suffix] == theirs_lines[-1 - suffix]):
+        suffix += 1
+
+    merged: list[str] = ours_lines[:prefix]
+    has_conflict = False
+    base_lines = base_lines[prefix:len(base_lines) - suffix]
+    tail = ours_lines[len(ours_lines) - suffix:]
+    ours_lines = ours_lines[prefix:len(ours_lines) - suffix]
+    theirs_lines = theirs_lines[prefix:len(theirs_lines) - suffix]
+    ib = io = it = 0
+
+    for b_start, b_end, o_start, o_end, t_start, t_end in _sync_regions(
+        base_lines, ours_lines, theirs_lines
+    ):
+        # Unstable chunk between the previous sync region and this one
+        base_chunk = base_lines[ib:b_start]
+        ours_chunk = ours_lines[io:o_start]
+        theirs_chunk = theirs_lines[it:t_start]
+
+        if ours_chunk == theirs_chunk or theirs_chunk == base_chunk:
+            merged.extend(ours_chunk)
+        elif ours_chunk == base_chunk:
+            merged.extend(theirs_chunk)
+        else:
+            has_conflict = True
+            merged.append(CONFLICT_START)
+            merged.extend(_ensure_newline(ours_chunk))
+            merged.append(CONFLICT_SEP)
+            merged.extend(_ensure_newline(theirs_chunk))
+            merged.append(CONFLICT_END)
 
-        # Run diff3 (diff3 -m -E MYFILE OLDFILE YOURFILE)
-        proc = subprocess.run(
-            ['diff3', '-m', '-E', ours_path, base_path, theirs_path],
-            capture_output=True,
-            text=True,
-            encoding="utf-8"
-        )
-        merged_content = str(proc.stdout)
-        has_conflict: bool = (proc.returncode == 1)
+        # Stable chunk, identical on all three sides
+        merged.extend(ours_lines[o_start:o_end])
+        ib, io, it = b_end, o_end, t_end
 
-        return merged_content, has_conflict
-
-    finally:
-        os.remove(base_f.name)
-        os.remove(ours_f.name)
-        os.remove(theirs_f.name)
+    merged.extend(tail)
+    return "".join(merged), has_conflict
 
 def three_way_merge_folder(
     base_folder: Snapshot,
@@ -166,10 +386,30 @@ def three_way_merge_folder(
         if base_content is not None and ours_content is None and theirs_content is None:
             continue
 
+        # 6. Same content on both sides, or only one side changed: no merge needed
+        if ours_content == theirs_content or theirs_content == base_content:
+            merged_snapshot[file_path] = (cast(str, ours_content), False)
+            continue
+        if ours_content == base_content:
+            merged_snapshot[file_path] = (cast(str, theirs_content), False)
+            continue
+
         merged_snapshot[file_path] = _three_way_merge_file(base_content, ours_content, theirs_content)
     
     return merged_snapshot
 
+def _revert_cl(p4: P4, cl_num: int) -> None:
+    """
+    Reverts every file opened in a CL. Runs at exception_level 1 so the
+    benign "file(s) not opened" warning doesn't raise.
+    """
+    saved_level = p4.exception_level # type: ignore
+    p4.exception_level = 1
+    try:
+        p4.run_revert("-c", cl_num, "//...") # type: ignore
+    finally:
+        p4.exception_level = saved_level
+
 def commit_snapshot_to_cl(
     p4: P4, 
     cl_num: int, 
@@ -181,27 +421,29 @@ def commit_snapshot_to_cl(
     Atomically updates a shelved CL to match the new snapshot.
     Handles file adds, edits, and deletes with batched commands.
     """
+    original_files = original_snapshot.keys()
+    new_files = new_snapshot.keys()
+
+    # Only include files that actually changed content
+    files_to_edit = {
+        f for f in (original_files & new_files)
+        if original_snapshot[f] != new_snapshot[f]
+    }
+    files_to_add = new_files - original_files
+    files_to_delete = original_files - new_files
+
+    log.debug("CL %d: files_to_edit: %s", cl_num, files_to_edit)
+    log.debug("CL %d: files_to_add: %s", cl_num, files_to_add)
+    log.debug("CL %d: files_to_delete: %s", cl_num, files_to_delete)
+
+    # Nothing changed: the shelf is already correct, skip all RPCs
+    if not (files_to_edit or files_to_add or files_to_delete):
+        log.debug("CL %d: snapshot unchanged, skipping commit", cl_num)
+        return
+
     try:
         # Revert any pending changes in this CL
-        try:
-            p4.run_revert("-c", cl_num, "//...") # type: ignore
-        except:
-            pass
-
-        original_files = set(original_snapshot.keys())
-        new_files = set(new_snapshot.keys())
-
-        # Only include files that actually changed content
-        files_to_edit = {
-            f for f in (original_files & new_files)
-            if original_snapshot.get(f) != new_snapshot.get(f)
-        }
-        files_to_add = new_files - original_files
-        files_to_delete = original_files - new_files
-
-        log.debug(f"CL {cl_num}: files_to_edit: {files_to_edit}")
-        log.debug(f"CL {cl_num}: files_to_add: {files_to_add}")
-        log.debug(f"CL {cl_num}: files_to_delete: {files_to_delete}")
+        _revert_cl(p4, cl_num)
 
         # --- Handle Adds/Edits ---
         files_to_write = list(files_to_edit | files_to_add)
@@ -215,30 +457,38 @@ def commit_snapshot_to_cl(
                         "Adding new files during 'update' is not yet supported.")
                 depot_paths_to_write.append(filename_to_depot[f])
             
-            log.debug(f"Attempt to run_edit, depot_paths_to_write: {depot_paths_to_write}")
-            p4.run_edit("-c", cl_num, *depot_paths_to_write) # type: ignore
+            log.debug("Attempt to run_edit, depot_paths_to_write: %s", depot_paths_to_write)
+            for i in range(0, len(depot_paths_to_write), _P4_ARGS_BATCH):
+                p4.run_edit("-c", cl_num, *depot_paths_to_write[i:i + _P4_ARGS_BATCH]) # type: ignore
+
+            # Resolve every local path up front instead of one p4 where per file
+            depot_to_local: dict[str, str] = {}
+            for i in range(0, len(depot_paths_to_write), _P4_ARGS_BATCH):
+                client_path_map = cast(list[RunWhere],
+                    p4.run_where(*depot_paths_to_write[i:i + _P4_ARGS_BATCH])) # type: ignore
+                for entry in client_path_map:
+                    if "unmap" not in entry and "path" in entry:
+                        depot_to_local[entry["depotFile"]] = entry["path"]
+            log.debug("depot_to_local: %s", depot_to_local)
+
+            # Create each parent directory once, however many files share it
+            for local_dir in {os.path.dirname(path) for path in depot_to_local.values()}:
+                os.makedirs(local_dir, exist_ok=True)
 
             for filename in files_to_write:
                 try:
                     depot_path = filename_to_depot[filename]
-                    client_path_map = cast(list[RunWhere], p4.run_where(depot_path)) # type: ignore
-                    
-                    log.debug(f"client_path_map for {filename}: {client_path_map}")
-                    if not client_path_map or "path" not in client_path_map[0]:
+                    if depot_path not in depot_to_local:
                         raise Exception(f"File not in client view: {depot_path}")
                     
-                    local_path: str = client_path_map[0]["path"]
-
-                    local_dir = os.path.dirname(local_path)
-                    if not os.path.exists(local_dir):
-                        os.makedirs(local_dir)
+                    local_path: str = depot_to_local[depot_path]
 
                     # Write the new content from memory to the local file
                     with open(local_path, "w", encoding="utf-8") as f:
                         f.write(new_snapshot[filename])
 
                 except Exception as e:
-                    log.error(f"Failed to write/map file {filename}: {e}")
+                    log.error("Failed to write/map file %s: %s", filename, e)
                     raise
         
         # --- Handle Deletes ---
@@ -246,18 +496,14 @@ def commit_snapshot_to_cl(
         if files_to_delete_list:
             # Convert filenames to depot paths for Perforce commands
             depot_paths_to_delete = [filename_to_depot[f] for f in files_to_delete_list]
-            p4.run_delete("-c", cl_num, *depot_paths_to_delete) # type: ignore
+            for i in range(0, len(depot_paths_to_delete), _P4_ARGS_BATCH):
+                p4.run_delete("-c", cl_num, *depot_paths_to_delete[i:i + _P4_ARGS_BATCH]) # type: ignore
 
         # --- Commit to Shelf ---
-        if files_to_write or files_to_delete_list:
-            p4.run_shelve("-f", "-c", cl_num) # type: ignore
-        else:
-            # If the CL is now empty, delete the shelve
-            if not new_files and original_files:
-                p4.run_shelve("-d", "-c", cl_num) # type: ignore
+        p4.run_shelve("-f", "-c", cl_num) # type: ignore
 
     except Exception as e:
-        log.error(f"Failed to commit snapshot to CL {cl_num}: {e}")
+        log.error("Failed to commit snapshot to CL %d: %s", cl_num, e)
         raise P4OperationError(f"Failed to commit snapshot to CL {cl_num}: {e}")
     finally:
-        p4.run_revert("-c", cl_num, "//...") # type: ignore
\ No newline at end of file
+        _revert_cl(p4, cl_num)
\ No newline at end of file
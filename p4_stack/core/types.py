@@ -34,11 +34,16 @@ class RunDescribeS(TypedDict, total=False):
     An element of the list result when running p4 describe -s, use to get CL desc
     """
     change: str
+    oldChange: str   # only for CLs renumbered on submit
     user: str
     client: str
     time: str
     desc: str
     status: str
+    # Per shelved file, only with -S
+    depotFile: list[str]
+    rev: list[str]
+    digest: list[str]
 
 
 class RunPropertyL(TypedDict):
@@ -1,13 +1,10 @@
 # p4_stack/main.py
 import logging
 import typer
-from rich.console import Console
 
 from .logging_config import setup_logging
-from .commands.create import create_stack
-from .commands.list import list_stack
-from .commands.update import update_stack
-# from .commands import upload_stack
+# Command modules are imported inside each command so that P4 and the
+# rebase engine are only loaded for the subcommand actually invoked.
 
 # Configure logging once at application startup
 setup_logging()
@@ -20,8 +17,6 @@ app = typer.Typer(
     add_completion=False,
 )
 
-console = Console(stderr=True)
-
 # Register the commands
 @app.command(
     "create",
@@ -34,6 +29,7 @@ def create_cmd(
         metavar="PARENT_CL",
     )
 ) -> None:
+    from .commands.create import create_stack
     create_stack(parent_cl=parent_cl)
 
 @app.command(
@@ -41,6 +37,7 @@ def create_cmd(
     help="List all pending stacks for the current user."
 )
 def list_cmd() -> None:
+    from .commands.list import list_stack
     list_stack()
 @app.command(
     "update",
@@ -54,6 +51,7 @@ def update_cmd(
         metavar="BASE_CL",
     )
 ) -> None:
+    from .commands.update import update_stack
     update_stack(base_cl=base_cl)
 
 # @app.command(
@@ -67,6 +65,7 @@ def update_cmd(
 #         metavar="CL_NUM",
 #     )
 # ) -> None:
+#     from .commands import upload_stack
 #     upload_stack(cl_num=cl_num)
 
 if __name__ == "__main__":
@@ -9,7 +9,8 @@ from p4_stack.core.graph import (
     build_stack_graph,
     get_stack_from_base,
     get_stack_for_cl,
-    get_changelist_status,
+    get_changelist_statuses,
+    parse_depends_on,
     DEPENDS_ON_RE,
 )
 from p4_stack.core.p4_actions import P4OperationError
@@ -50,6 +51,28 @@ class TestDependsOnRegex:
             assert match is not None
 
 
+class TestParseDependsOn:
+    """Test the parse_depends_on function."""
+    
+    def test_parse_depends_on_extracts_number(self):
+        """Should return the parent CL as an int."""
+        assert parse_depends_on("Some description\n\nDepends-On: 123\n") == 123
+    
+    def test_parse_depends_on_no_tag(self):
+        """Should return None when there is no Depends-On tag."""
+        assert parse_depends_on("Just a normal description") is None
+    
+    def test_parse_depends_on_tag_without_number(self):
+        """Should skip a tag with no number and use the next valid one."""
+        assert parse_depends_on("Depends-On: none\nDepends-On: 42") == 42
+        assert parse_depends_on("Depends-On:") is None
+    
+    def test_parse_depends_on_whitespace_and_case(self):
+        """Should accept any whitespace after the tag, like DEPENDS_ON_RE, but only the exact tag case."""
+        assert parse_depends_on("Depends-On:\xa0123") == 123
+        assert parse_depends_on("depends-on: 100") is None
+
+
 class TestBuildStackGraph:
     """Test the build_stack_graph function."""
     
@@ -206,74 +229,72 @@ class TestGetStackForCl:
         assert result == [100, 101, 102, 103, 104]
 
 
-class TestGetChangelistStatus:
-    """Test the get_changelist_status function."""
+class TestGetChangelistStatuses:
+    """Test the get_changelist_statuses function."""
     
-    def test_get_changelist_status_pending(self):
-        """Should return '(pending)' for pending changelists."""
+    def test_get_changelist_statuses_single_describe(self):
+        """Should fetch every status with one p4 describe call."""
         mock_p4 = Mock()
         mock_p4.run.return_value = [
-            {
-                'change': '100',
-                'status': 'pending',
-                'desc': 'Test CL',
-            }
+            {'change': '100', 'status': 'submitted'},
+            {'change': '101', 'status': 'pending'},
         ]
         
-        result = get_changelist_status(mock_p4, 100)
-        assert result == "(pending)"
+        result = get_changelist_statuses(mock_p4, [100, 101])
+        
+        assert result == {100: "(submitted)", 101: "(pending)"}
+        mock_p4.run.assert_called_once_with("describe", "-s", "100", "101")
     
-    def test_get_changelist_status_submitted(self):
-        """Should return '(submitted)' for submitted changelists."""
+    def test_get_changelist_statuses_case_insensitive(self):
+        """Should handle status field case-insensitively."""
         mock_p4 = Mock()
-        mock_p4.run.return_value = [
-            {
-                'change': '100',
-                'status': 'submitted',
-                'desc': 'Test CL',
-            }
-        ]
+        mock_p4.run.return_value = [{'change': '100', 'status': 'PENDING'}]
         
-        result = get_changelist_status(mock_p4, 100)
-        assert result == "(submitted)"
+        assert get_changelist_statuses(mock_p4, [100]) == {100: "(pending)"}
     
-    def test_get_changelist_status_case_insensitive(self):
-        """Should handle status field case-insensitively."""
+    def test_get_changelist_statuses_renumbered_submit(self):
+        """Should report a parent renumbered on submit as '(submitted)' via oldChange."""
         mock_p4 = Mock()
         mock_p4.run.return_value = [
-            {
-                'change': '100',
-                'status': 'PENDING',
-                'desc': 'Test CL',
-            }
+            {'change': '105', 'oldChange': '100', 'status': 'submitted'},
+            {'change': '101', 'status': 'pending'},
         ]
         
-        result = get_changelist_status(mock_p4, 100)
-        assert result == "(pending)"
+        result = get_changelist_statuses(mock_p4, [100, 101])
+        
+        assert result == {100: "(submitted)", 101: "(pending)"}
     
-    def test_get_changelist_status_not_found(self):
-        """Should return '(not found)' when CL doesn't exist."""
+    def test_get_changelist_statuses_missing_cl(self):
+        """Should mark CLs absent from the output as '(not found)'."""
         mock_p4 = Mock()
-        mock_p4.run.return_value = []
+        mock_p4.run.return_value = [{'change': '100', 'status': 'pending'}]
         
-        result = get_changelist_status(mock_p4, 999)
-        assert result == "(not found)"
+        result = get_changelist_statuses(mock_p4, [100, 999])
+        
+        assert result == {100: "(pending)", 999: "(not found)"}
     
-    def test_get_changelist_status_error_handling(self):
-        """Should return '(not found)' on P4 errors."""
+    def test_get_changelist_statuses_restores_exception_level(self):
+        """Should describe at exception_level 0 and restore it afterwards."""
         mock_p4 = Mock()
-        mock_p4.run.side_effect = Exception("P4 error")
+        mock_p4.exception_level = 2
+        levels_during_describe: list[int] = []
+        def describe(*args: str) -> list[dict[str, str]]:
+            levels_during_describe.append(mock_p4.exception_level)
+            raise Exception("P4 error")
+        mock_p4.run.side_effect = describe
+        
+        result = get_changelist_statuses(mock_p4, [100])
         
-        result = get_changelist_status(mock_p4, 100)
-        assert result == "(not found)"
+        assert result == {100: "(not found)"}
+        assert levels_during_describe == [0]
+        assert mock_p4.exception_level == 2
     
-    def test_get_changelist_status_empty_result(self):
-        """Should return '(not found)' for empty results."""
+    def test_get_changelist_statuses_empty(self):
+        """Should not call p4 when there are no nodes."""
         mock_p4 = Mock()
-        mock_p4.run.return_value = []
         
-        result = get_changelist_status(mock_p4, 100)
-        assert result == "(not found)"
+        assert get_changelist_statuses(mock_p4, []) == {}
+        mock_p4.run.assert_not_called()
 
 
 class TestGraphIntegration:
@@ -0,0 +1,94 @@
+"""
+Pytest tests for p4_stack.core.p4_actions module.
+
+Tests how P4Connection maps P4Python errors onto p4-stack exceptions.
+"""
+import re
+from pathlib import Path
+import pytest
+from unittest.mock import Mock, patch
+from P4 import P4Exception as P4LibException # type: ignore
+from p4_stack import __version__
+from p4_stack.core.p4_actions import (
+    P4Connection,
+    P4Exception,
+    P4ConnectionError,
+    P4LoginRequiredError,
+    P4OperationError,
+)
+
+
+def _make_connection() -> P4Connection:
+    with patch('p4_stack.core.p4_actions.P4'):
+        conn = P4Connection()
+    conn.p4.connected.return_value = True
+    conn.p4.errors = []
+    return conn
+
+
+class TestTranslateP4Errors:
+    """Test the error translation applied to P4Connection.run and save_change."""
+    
+    def test_save_change_login_error(self):
+        """Should raise P4LoginRequiredError when the session has expired."""
+        conn = _make_connection()
+        conn.p4.save_change.side_effect = P4LibException("Your session has expired, please login again.")
+        
+        with pytest.raises(P4LoginRequiredError):
+            conn.save_change(Mock())
+    
+    def test_save_change_p4_error_gets_failure_prefix(self):
+        """Should raise P4OperationError prefixed with the method's failure message."""
+        conn = _make_connection()
+        conn.p4.save_change.side_effect = P4LibException("Change 100 unknown.")
+        conn.p4.errors = ["Change 100 unknown."]
+        
+        with pytest.raises(P4OperationError, match=r"^Failed to save changelist: .*Change 100 unknown"):
+            conn.save_change(Mock())
+    
+    def test_internal_p4_exception_propagates_unchanged(self):
+        """Should re-raise p4-stack's own exceptions as is, not wrap them."""
+        conn = _make_connection()
+        original = P4OperationError("already translated")
+        conn.p4.save_change.side_effect = original
+        
+        with pytest.raises(P4OperationError) as exc_info:
+            conn.save_change(Mock())
+        
+        assert exc_info.value is original
+    
+    def test_unexpected_error_is_wrapped(self):
+        """Should wrap non-P4 exceptions in the base P4Exception."""
+        conn = _make_connection()
+        conn.p4.run.side_effect = ValueError("boom")
+        
+        with pytest.raises(P4Exception, match="Unexpected error: boom"):
+            conn.run("changes")
+    
+    def test_not_connected(self):
+        """Should refuse to run anything without a live connection."""
+        conn = _make_connection()
+        conn.p4.connected.return_value = False
+        
+        with pytest.raises(P4ConnectionError, match="not connected"):
+            conn.save_change(Mock())
+        conn.p4.save_change.assert_not_called()
+
+
+class TestP4ConnectionIdentity:
+    """Test how P4Connection identifies itself to the server."""
+    
+    def test_version_matches_pyproject(self):
+        """Should report the same version as pyproject.toml."""
+        pyproject = (Path(__file__).parent.parent / 'pyproject.toml').read_text()
+        match = re.search(r'^version\s*=\s*"([^"]+)"', pyproject, re.MULTILINE)
+        
+        assert match is not None
+        assert __version__ == match.group(1)
+    
+    def test_sets_prog_and_version(self):
+        """Should set prog and version on the P4 object before connecting."""
+        conn = _make_connection()
+        
+        assert conn.p4.prog == "p4-stack"
+        assert conn.p4.version == __version__
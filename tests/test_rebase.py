@@ -8,6 +8,7 @@ import os
 from unittest.mock import Mock, patch, mock_open
 from p4_stack.core.rebase import (
     get_cl_snapshot,
+    get_cl_snapshot_cached,
     edit_snapshot_with_editor,
     _three_way_merge_file,
     three_way_merge_folder,
@@ -113,6 +114,133 @@ class TestGetClSnapshot:
             get_cl_snapshot(mock_p4, 100)
 
 
+class TestGetClSnapshotCached:
+    """Test the get_cl_snapshot_cached function."""
+    
+    def _make_p4(self, digest: str = 'AAAA', status: str = 'pending') -> Mock:
+        mock_p4 = Mock()
+        mock_p4.run_describe.return_value = [{
+            'change': '100',
+            'time': '1000',
+            'status': status,
+            'depotFile': ['//depot/file.txt'],
+            'rev': ['1'],
+            'digest': [digest],
+        }]
+        mock_p4.run_print.return_value = [
+            {'depotFile': '//depot/file.txt'},
+            'content',
+        ]
+        return mock_p4
+    
+    def test_cached_snapshot_skips_second_print(self, tmp_path):
+        """Should serve a repeat fetch of an unchanged shelf from disk."""
+        mock_p4 = self._make_p4()
+        
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            first = get_cl_snapshot_cached(mock_p4, 100)
+            second = get_cl_snapshot_cached(mock_p4, 100)
+        
+        assert first == second == ({'file.txt': 'content'}, {'file.txt': '//depot/file.txt'})
+        assert mock_p4.run_print.call_count == 1
+        mock_p4.run_describe.assert_called_with("-s", "-S", 100)
+    
+    def test_cached_snapshot_dir_is_private(self, tmp_path):
+        """Should create the cache directory readable by the current user only."""
+        cache_dir = tmp_path / 'shelves'
+        
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', cache_dir):
+            get_cl_snapshot_cached(self._make_p4(), 100)
+        
+        assert cache_dir.stat().st_mode & 0o777 == 0o700
+    
+    def test_cached_snapshot_touch_failure_keeps_hit(self, tmp_path):
+        """Should still serve a cache hit if refreshing its mtime fails."""
+        mock_p4 = self._make_p4()
+        
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            get_cl_snapshot_cached(mock_p4, 100)
+            with patch('p4_stack.core.rebase.os.utime', side_effect=PermissionError("read-only")):
+                snapshot, _ = get_cl_snapshot_cached(mock_p4, 100)
+        
+        assert snapshot == {'file.txt': 'content'}
+        assert mock_p4.run_print.call_count == 1
+    
+    def test_cached_snapshot_unreadable_entry_refetches(self, tmp_path):
+        """Should ignore a corrupt cache entry and re-fetch over it."""
+        mock_p4 = self._make_p4()
+        
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            get_cl_snapshot_cached(mock_p4, 100)
+            (entry,) = tmp_path.iterdir()
+            entry.write_text('not json')
+            snapshot, _ = get_cl_snapshot_cached(mock_p4, 100)
+        
+        assert snapshot == {'file.txt': 'content'}
+        assert mock_p4.run_print.call_count == 2
+    
+    def test_cached_snapshot_invalidated_by_new_digest_same_time(self, tmp_path):
+        """Should re-fetch when shelved content changes, even if the CL time does not."""
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            get_cl_snapshot_cached(self._make_p4('AAAA'), 100)
+            stale_entries = list(tmp_path.iterdir())
+            
+            mock_p4 = self._make_p4('BBBB')
+            mock_p4.run_print.return_value = [{'depotFile': '//depot/file.txt'}, 'reshelved']
+            snapshot, _ = get_cl_snapshot_cached(mock_p4, 100)
+        
+        assert snapshot == {'file.txt': 'reshelved'}
+        mock_p4.run_print.assert_called_once()
+        entries = list(tmp_path.iterdir())
+        assert len(entries) == 1 and entries != stale_entries
+    
+    def test_cached_snapshot_without_digests_bypasses_cache(self, tmp_path):
+        """Should not cache when the server reports no digests to key on."""
+        mock_p4 = self._make_p4()
+        del mock_p4.run_describe.return_value[0]['digest']
+        
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            get_cl_snapshot_cached(mock_p4, 100)
+            get_cl_snapshot_cached(mock_p4, 100)
+        
+        assert mock_p4.run_print.call_count == 2
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_cached_snapshot_submitted_cl_evicts_entries(self, tmp_path):
+        """Should bypass the cache and drop old entries once the CL is submitted."""
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            get_cl_snapshot_cached(self._make_p4(), 100)
+            get_cl_snapshot_cached(self._make_p4(status='submitted'), 100)
+        
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_cached_snapshot_describe_failure_falls_back(self, tmp_path):
+        """Should fetch directly, and evict old entries, if describe fails."""
+        (tmp_path / '100_deadbeef.json').write_bytes(b'')
+        mock_p4 = self._make_p4()
+        mock_p4.run_describe.side_effect = Exception("no such changelist")
+        
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            snapshot, _ = get_cl_snapshot_cached(mock_p4, 100)
+        
+        assert snapshot == {'file.txt': 'content'}
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_cached_snapshot_prunes_long_unused_entries(self, tmp_path):
+        """Should prune other CLs' entries older than the max age on write."""
+        old_entry = tmp_path / '99_deadbeef.json'
+        old_entry.write_bytes(b'')
+        os.utime(old_entry, (0, 0))
+        recent_entry = tmp_path / '98_deadbeef.json'
+        recent_entry.write_bytes(b'')
+        
+        with patch('p4_stack.core.rebase.SNAPSHOT_CACHE_DIR', tmp_path):
+            get_cl_snapshot_cached(self._make_p4(), 100)
+        
+        assert not old_entry.exists()
+        assert recent_entry.exists()
+
+
 class TestEditSnapshotWithEditor:
     """Test the edit_snapshot_with_editor function."""
     
@@ -177,121 +305,91 @@ class TestEditSnapshotWithEditor:
 class TestThreeWayMergeFile:
     """Test the _three_way_merge_file function."""
     
-    @patch('subprocess.run')
-    def test_three_way_merge_no_conflict(self, mock_run):
-        """Should return merged content without conflict."""
-        mock_run.return_value.returncode = 0
-        mock_run.return_value.stdout = "merged content"
-        
-        base = "original"
-        ours = "ours change"
-        theirs = "theirs change"
+    def test_three_way_merge_no_conflict(self):
+        """Should combine non-overlapping changes from both sides."""
+        base = "a\nb\nc\nd\ne\n"
+        ours = "a\nB\nc\nd\ne\n"
+        theirs = "a\nb\nc\nd\nE\n"
         
         content, has_conflict = _three_way_merge_file(base, ours, theirs)
         
-        assert content == "merged content"
+        assert content == "a\nB\nc\nd\nE\n"
         assert has_conflict is False
     
-    @patch('subprocess.run')
-    def test_three_way_merge_with_conflict(self, mock_run):
-        """Should detect conflicts (diff3 returns 1)."""
-        mock_run.return_value.returncode = 1
-        mock_run.return_value.stdout = "<<<<<<< CONFLICT\nours\n=======\ntheirs\n>>>>>>>"
-        
-        base = "original"
-        ours = "ours change"
-        theirs = "theirs change"
+    def test_three_way_merge_with_conflict(self):
+        """Should emit conflict markers when both sides change the same lines."""
+        base = "a\nb\nc\n"
+        ours = "a\nours\nc\n"
+        theirs = "a\ntheirs\nc\n"
         
         content, has_conflict = _three_way_merge_file(base, ours, theirs)
         
         assert has_conflict is True
-        assert "<<<<<<" in content
+        assert content == (
+            "a\n<<<<<<< ours\nours\n=======\ntheirs\n>>>>>>> theirs\nc\n"
+        )
     
-    @patch('subprocess.run')
-    def test_three_way_merge_handles_none_values(self, mock_run):
-        """Should handle None values (file adds/deletes)."""
-        mock_run.return_value.returncode = 0
-        mock_run.return_value.stdout = "new content"
-        
-        # File added in ours, not in base/theirs
-        _, has_conflict = _three_way_merge_file(None, "new content", None)
+    def test_three_way_merge_identical_changes(self):
+        """Should take an identical change on both sides once, without conflict."""
+        content, has_conflict = _three_way_merge_file("a\nb\n", "a\nX\n", "a\nX\n")
         
+        assert content == "a\nX\n"
         assert has_conflict is False
     
-    @patch('subprocess.run')
-    def test_three_way_merge_calls_diff3_correctly(self, mock_run):
-        """Should call diff3 with correct arguments."""
-        mock_run.return_value.returncode = 0
-        mock_run.return_value.stdout = "result"
-        
-        _three_way_merge_file("base", "ours", "theirs")
-        
-        # Verify diff3 was called
-        call_args = mock_run.call_args[0][0]
-        assert call_args[0] == 'diff3'
-        assert call_args[1] == '-m'
-        assert call_args[2] == '-E'
-
-
-class TestThreeWayMergeFolder:
-    """Test the three_way_merge_folder function."""
-    
-    @patch('subprocess.run')
-    def test_three_way_merge_folder_file_added_only_in_ours(self, mock_run):
-        """Should keep file added only in ours (child)."""
-        base_folder: Snapshot = {}
-        ours_folder: Snapshot = {'newfile.txt': 'content'}
-        theirs_folder: Snapshot = {}
-        
-        result = three_way_merge_folder(base_folder, ours_folder, theirs_folder)
-        
-        assert 'newfile.txt' in result
-        assert result['newfile.txt'] == ('content', False)
-    
-    @patch('subprocess.run')
-    def test_three_way_merge_folder_file_added_only_in_theirs(self, mock_run):
-        """Should keep file added only in theirs (new parent)."""
-        base_folder: Snapshot = {}
-        ours_folder: Snapshot = {}
-        theirs_folder: Snapshot = {'newfile.txt': 'parent content'}
-        
-        result = three_way_merge_folder(base_folder, ours_folder, theirs_folder)
+    def test_three_way_merge_handles_none_values(self):
+        """Should handle None values (file adds/deletes)."""
+        # File added in ours, not in base/theirs
+        content, has_conflict = _three_way_merge_file(None, "new content", None)
         
-        assert 'newfile.txt' in result
-        assert result['newfile.txt'] == ('parent content', False)
+        assert content == "new content"
+        assert has_conflict is False
     
-    @patch('subprocess.run')
-    def test_three_way_merge_folder_file_deleted_in_ours_unchanged_theirs(self, mock_run):
-        """Should skip file deleted in ours if unchanged in theirs."""
-        base_folder: Snapshot = {'file.txt': 'content'}
-        ours_folder: Snapshot = {}  # Deleted
-        theirs_folder: Snapshot = {'file.txt': 'content'}  # Unchanged
+    def test_three_way_merge_conflict_without_trailing_newline(self):
+        """Should keep conflict markers on their own lines."""
+        content, has_conflict = _three_way_merge_file("a\nb", "a\nc", "a\nd")
         
-        result = three_way_merge_folder(base_folder, ours_folder, theirs_folder)
-        
-        assert 'file.txt' not in result
+        assert has_conflict is True
+        assert content == "a\n<<<<<<< ours\nc\n=======\nd\n>>>>>>> theirs\n"
     
-    @patch('subprocess.run')
-    def test_three_way_merge_folder_file_deleted_in_theirs_unchanged_ours(self, mock_run):
-        """Should skip file deleted in theirs if unchanged in ours."""
-        base_folder: Snapshot = {'file.txt': 'content'}
-        ours_folder: Snapshot = {'file.txt': 'content'}  # Unchanged
-        theirs_folder: Snapshot = {}  # Deleted
+    def test_three_way_merge_large_repetitive_file(self):
+        """Should merge edits at opposite ends of a large file made of repeated lines."""
+        lines = [("}\n", "\n", "    return x;\n", f"int v{i};\n")[i % 4] for i in range(30000)]
+        base = "".join(lines)
+        ours = "// header\n" + "".join(lines[1:])
+        theirs = "".join(lines[:-1]) + "// footer\n"
         
-        result = three_way_merge_folder(base_folder, ours_folder, theirs_folder)
+        content, has_conflict = _three_way_merge_file(base, ours, theirs)
         
-        assert 'file.txt' not in result
+        assert content == "// header\n" + "".join(lines[1:-1]) + "// footer\n"
+        assert has_conflict is False
+
+
+class TestThreeWayMergeFolder:
+    """Test the three_way_merge_folder function."""
     
-    @patch('subprocess.run')
-    def test_three_way_merge_folder_file_deleted_both(self, mock_run):
-        """Should skip file deleted in both branches."""
-        base_folder: Snapshot = {'file.txt': 'content'}
-        ours_folder: Snapshot = {}
-        theirs_folder: Snapshot = {}
-        
+    @pytest.mark.parametrize("base_folder,ours_folder,theirs_folder,expected", [
+        pytest.param({}, {'newfile.txt': 'content'}, {},
+                     {'newfile.txt': ('content', False)}, id="added_only_in_ours"),
+        pytest.param({}, {}, {'newfile.txt': 'parent content'},
+                     {'newfile.txt': ('parent content', False)}, id="added_only_in_theirs"),
+        pytest.param({'file.txt': 'content'}, {}, {'file.txt': 'content'},
+                     {}, id="deleted_in_ours_unchanged_theirs"),
+        pytest.param({'file.txt': 'content'}, {'file.txt': 'content'}, {},
+                     {}, id="deleted_in_theirs_unchanged_ours"),
+        pytest.param({'file.txt': 'content'}, {}, {},
+                     {}, id="deleted_both"),
+    ])
+    def test_three_way_merge_folder_add_delete(
+        self,
+        base_folder: Snapshot,
+        ours_folder: Snapshot,
+        theirs_folder: Snapshot,
+        expected: dict[str, tuple[str, bool]],
+    ):
+        """Should keep one-sided adds and drop files deleted without a conflicting edit."""
         result = three_way_merge_folder(base_folder, ours_folder, theirs_folder)
         
-        assert 'file.txt' not in result
+        assert result == expected
     
     @patch('p4_stack.core.rebase._three_way_merge_file')
     def test_three_way_merge_folder_modified_file(self, mock_merge):
@@ -308,12 +406,24 @@ class TestThreeWayMergeFolder:
         assert result['file.txt'] == ('merged content', False)
         mock_merge.assert_called_once()
     
-    @patch('subprocess.run')
-    def test_three_way_merge_folder_complex_scenario(self, mock_run):
-        """Should handle complex merge scenarios."""
-        mock_run.return_value.returncode = 0
-        mock_run.return_value.stdout = "merged"
+    @patch('p4_stack.core.rebase._three_way_merge_file')
+    def test_three_way_merge_folder_one_sided_changes_skip_merge(self, mock_merge):
+        """Should resolve unchanged or identically changed files without merging."""
+        base_folder: Snapshot = {'same.txt': 'base', 'ours.txt': 'base', 'theirs.txt': 'base'}
+        ours_folder: Snapshot = {'same.txt': 'both', 'ours.txt': 'ours', 'theirs.txt': 'base'}
+        theirs_folder: Snapshot = {'same.txt': 'both', 'ours.txt': 'base', 'theirs.txt': 'theirs'}
         
+        result = three_way_merge_folder(base_folder, ours_folder, theirs_folder)
+        
+        assert result == {
+            'same.txt': ('both', False),
+            'ours.txt': ('ours', False),
+            'theirs.txt': ('theirs', False),
+        }
+        mock_merge.assert_not_called()
+    
+    def test_three_way_merge_folder_complex_scenario(self):
+        """Should handle complex merge scenarios."""
         base_folder: Snapshot = {
             'file1.txt': 'base1',
             'file2.txt': 'base2',
@@ -344,7 +454,7 @@ class TestCommitSnapshotToCl:
     """Test the commit_snapshot_to_cl function."""
     
     def test_commit_snapshot_no_changes(self):
-        """Should handle case where no files changed."""
+        """Should skip all P4 calls when no files changed."""
         mock_p4 = Mock()
         
         original_snapshot: Snapshot = {'file.txt': 'content'}
@@ -354,16 +464,34 @@ class TestCommitSnapshotToCl:
         # Should not raise
         commit_snapshot_to_cl(mock_p4, 100, new_snapshot, original_snapshot, file_map)
         
-        # Verify revert was called
-        mock_p4.run_revert.assert_called()
+        # Verify nothing was opened, shelved or reverted
+        mock_p4.run_revert.assert_not_called()
+        mock_p4.run_edit.assert_not_called()
+        mock_p4.run_shelve.assert_not_called()
+    
+    def test_commit_snapshot_reverts_at_errors_only_level(self):
+        """Should revert with warnings suppressed, then restore exception_level."""
+        mock_p4 = Mock()
+        mock_p4.exception_level = 2
+        levels_during_revert: list[int] = []
+        mock_p4.run_revert.side_effect = lambda *args: levels_during_revert.append(mock_p4.exception_level)
+        
+        original_snapshot: Snapshot = {'file.txt': 'content'}
+        new_snapshot: Snapshot = {}
+        file_map: FileToDepot = {'file.txt': '//depot/file.txt'}
+        
+        commit_snapshot_to_cl(mock_p4, 100, new_snapshot, original_snapshot, file_map)
+        
+        assert levels_during_revert == [1, 1]
+        assert mock_p4.exception_level == 2
     
     def test_commit_snapshot_file_edit(self):
         """Should handle file edits."""
         mock_p4 = Mock()
-        mock_p4.run_where.return_value = [{'path': '/home/user/file.txt'}]
+        mock_p4.run_where.return_value = [{'depotFile': '//depot/file.txt', 'path': '/home/user/file.txt'}]
         
         with patch('builtins.open', mock_open()):
-            with patch('os.path.exists', return_value=True):
+            with patch('os.makedirs'):
                 original_snapshot: Snapshot = {'file.txt': 'old'}
                 new_snapshot: Snapshot = {'file.txt': 'new'}
                 file_map: FileToDepot = {'file.txt': '//depot/file.txt'}
@@ -378,10 +506,10 @@ class TestCommitSnapshotToCl:
     def test_commit_snapshot_file_add(self):
         """Should handle file adds."""
         mock_p4 = Mock()
-        mock_p4.run_where.return_value = [{'path': '/home/user/newfile.txt'}]
+        mock_p4.run_where.return_value = [{'depotFile': '//depot/newfile.txt', 'path': '/home/user/newfile.txt'}]
         
         with patch('builtins.open', mock_open()):
-            with patch('os.path.exists', return_value=True):
+            with patch('os.makedirs'):
                 original_snapshot: Snapshot = {}
                 new_snapshot: Snapshot = {'newfile.txt': 'content'}
                 file_map: FileToDepot = {'newfile.txt': '//depot/newfile.txt'}
@@ -403,6 +531,29 @@ class TestCommitSnapshotToCl:
         # Verify delete was called
         mock_p4.run_delete.assert_called()
     
+    def test_commit_snapshot_batches_file_arguments(self):
+        """Should split large edit/where/delete argument lists into bounded batches."""
+        mock_p4 = Mock()
+        mock_p4.run_where.side_effect = lambda *paths: [
+            {'depotFile': p, 'path': p.replace('//depot', '/home/user')} for p in paths
+        ]
+        
+        original_snapshot: Snapshot = {f'e{i}.txt': 'old' for i in range(3)}
+        original_snapshot.update({f'd{i}.txt': 'old' for i in range(3)})
+        new_snapshot: Snapshot = {f'e{i}.txt': 'new' for i in range(3)}
+        file_map: FileToDepot = {f: f'//depot/{f}' for f in original_snapshot}
+        
+        with patch('p4_stack.core.rebase._P4_ARGS_BATCH', 2):
+            with patch('builtins.open', mock_open()):
+                with patch('os.makedirs'):
+                    commit_snapshot_to_cl(mock_p4, 100, new_snapshot, original_snapshot, file_map)
+        
+        assert mock_p4.run_edit.call_count == 2
+        assert mock_p4.run_where.call_count == 2
+        assert mock_p4.run_delete.call_count == 2
+        edited = [p for call in mock_p4.run_edit.call_args_list for p in call.args[2:]]
+        assert sorted(edited) == [f'//depot/e{i}.txt' for i in range(3)]
+    
     def test_commit_snapshot_new_file_not_in_map_raises_error(self):
         """Should raise error if trying to add file not in map."""
         mock_p4 = Mock()
@@ -429,22 +580,20 @@ class TestCommitSnapshotToCl:
     def test_commit_snapshot_creates_directories(self):
         """Should create directories if they don't exist."""
         mock_p4 = Mock()
-        mock_p4.run_where.return_value = [{'path': '/home/user/new/dir/file.txt'}]
+        mock_p4.run_where.return_value = [{'depotFile': '//depot/file.txt', 'path': '/home/user/new/dir/file.txt'}]
         
         with patch('builtins.open', mock_open()):
-            with patch('os.path.exists', return_value=False):
-                with patch('os.makedirs') as mock_makedirs:
-                    original_snapshot: Snapshot = {}
-                    new_snapshot: Snapshot = {'file.txt': 'content'}
-                    file_map: FileToDepot = {'file.txt': '//depot/file.txt'}
-                    
-                    commit_snapshot_to_cl(mock_p4, 100, new_snapshot, original_snapshot, file_map)
+            with patch('os.makedirs') as mock_makedirs:
+                original_snapshot: Snapshot = {}
+                new_snapshot: Snapshot = {'file.txt': 'content'}
+                file_map: FileToDepot = {'file.txt': '//depot/file.txt'}
+                
+                commit_snapshot_to_cl(mock_p4, 100, new_snapshot, original_snapshot, file_map)
         
-        # Verify makedirs was called
-        mock_makedirs.assert_called()
+        mock_makedirs.assert_called_once_with('/home/user/new/dir', exist_ok=True)
     
-    def test_commit_snapshot_empty_cl_deletes_shelve(self):
-        """Should delete shelve if CL becomes empty."""
+    def test_commit_snapshot_all_files_deleted_reshelves_deletes(self):
+        """Should open every file for delete and re-shelve them, not delete the shelf."""
         mock_p4 = Mock()
         
         original_snapshot: Snapshot = {'file.txt': 'content'}
@@ -453,5 +602,5 @@ class TestCommitSnapshotToCl:
         
         commit_snapshot_to_cl(mock_p4, 100, new_snapshot, original_snapshot, file_map)
         
-        # Verify shelve delete was called
-        mock_p4.run_shelve.assert_called()
+        mock_p4.run_delete.assert_called_once_with("-c", 100, '//depot/file.txt')
+        mock_p4.run_shelve.assert_called_once_with("-f", "-c", 100)